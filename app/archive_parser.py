@@ -1,22 +1,47 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import os
 import shutil
 import subprocess
 import tempfile
+import time
 import zipfile
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import Callable
 
-from .docx_parser import SUPPORTED_EXTENSIONS, extract_document_text
+from .docx_parser import (
+    SUPPORTED_EXTENSIONS,
+    ExtractionProcessPool,
+    convert_documents_via_libreoffice,
+    extract_document_text,
+)
 
 SUPPORTED_ARCHIVE_EXTENSIONS = {".rar", ".zip"}
 MAX_ARCHIVE_DOCUMENTS = 30
+LIBREOFFICE_CONVERSIONS = {".doc": ".docx", ".odt": ".docx", ".ods": ".xlsx"}
+ARCHIVE_EXTRACT_TIMEOUT_SECONDS = 120
+ARCHIVE_POLL_SECONDS = 0.2
+ARCHIVE_EXTRACT_WORKERS = 4
+RAR5_SIGNATURE = b"Rar!\x1a\x07\x01\x00"
+
+_UNRAR = shutil.which("unrar")
+_SEVEN_ZIP = shutil.which("7z") or shutil.which("7za")
+_BSDTAR = shutil.which("bsdtar")
+_UNAR = shutil.which("unar")
 
 
 class ArchiveExtractionError(RuntimeError):
     """Raised when archive extraction fails."""
 
 
-def extract_archive_document_texts(archive_path: Path) -> list[tuple[str, str]]:
+def extract_archive_document_texts(
+    archive_path: Path,
+    document_executor: Executor | None = None,
+) -> list[tuple[str, str]]:
     suffix = archive_path.suffix.lower()
     if suffix not in SUPPORTED_ARCHIVE_EXTENSIONS:
         raise ArchiveExtractionError(
@@ -24,52 +49,212 @@ def extract_archive_document_texts(archive_path: Path) -> list[tuple[str, str]]:
             f"Supported: {', '.join(sorted(SUPPORTED_ARCHIVE_EXTENSIONS))}"
         )
 
-    with tempfile.TemporaryDirectory(prefix="archive_extract_") as tmp_dir_name:
+    owned_executor: ExtractionProcessPool | None = None
+
+    def submit(path: Path) -> Future[str]:
+        # Without a caller-provided pool, workers are only started once the
+        # archive actually yields a document, and never by forking this
+        # (threaded) process.
+        nonlocal owned_executor
+        executor = document_executor
+        if executor is None:
+            if owned_executor is None:
+                owned_executor = ExtractionProcessPool(
+                    max_workers=min(os.cpu_count() or 1, ARCHIVE_EXTRACT_WORKERS)
+                )
+            executor = owned_executor
+        return executor.submit(extract_document_text, path)
+
+    try:
+        return _extract_archive_document_texts(archive_path, submit)
+    finally:
+        if owned_executor is not None:
+            owned_executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _extract_archive_document_texts(
+    archive_path: Path,
+    submit: Callable[[Path], Future[str]],
+) -> list[tuple[str, str]]:
+    with (
+        tempfile.TemporaryDirectory(prefix="archive_extract_") as tmp_dir_name,
+        tempfile.TemporaryDirectory(prefix="archive_convert_") as convert_dir_name,
+    ):
         extract_dir = Path(tmp_dir_name)
-        _extract_archive(archive_path=archive_path, output_dir=extract_dir)
+        early_futures: dict[Path, tuple[Future[str], tuple[int, int]]] = {}
 
-        docs = sorted(
-            path
-            for path in extract_dir.rglob("*")
-            if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
-        )
+        def submit_early(path: Path) -> None:
+            # Documents that need no LibreOffice conversion are parsed while
+            # the rest of the archive is still being unpacked.
+            suffix = path.suffix.lower()
+            if (
+                path in early_futures
+                or len(early_futures) >= MAX_ARCHIVE_DOCUMENTS
+                or suffix not in SUPPORTED_EXTENSIONS
+                or suffix in LIBREOFFICE_CONVERSIONS
+            ):
+                return
+            early_futures[path] = (submit(path), _file_signature(path))
 
-        if not docs:
-            raise ArchiveExtractionError(
-                "Archive does not contain supported files "
-                f"({', '.join(sorted(SUPPORTED_EXTENSIONS))})"
+        futures: dict[Path, Future[str]] = {}
+        try:
+            _extract_archive(
+                archive_path=archive_path,
+                output_dir=extract_dir,
+                on_file=submit_early,
             )
 
-        extracted: list[tuple[str, str]] = []
-        errors: list[str] = []
+            docs = _find_supported_documents(extract_dir)
 
-        for path in docs[:MAX_ARCHIVE_DOCUMENTS]:
-            relative_name = path.relative_to(extract_dir).as_posix()
-            try:
-                text = extract_document_text(path)
-                if text.strip():
-                    extracted.append((relative_name, text))
+            if not docs:
+                raise ArchiveExtractionError(
+                    "Archive does not contain supported files "
+                    f"({', '.join(sorted(SUPPORTED_EXTENSIONS))})"
+                )
+
+            extracted: list[tuple[str, str]] = []
+            errors: list[str] = []
+
+            docs = docs[:MAX_ARCHIVE_DOCUMENTS]
+            for path, (future, signature) in early_futures.items():
+                # Skip results for files beyond the limit or rewritten after submit.
+                if path in docs and _file_signature(path) == signature:
+                    futures[path] = future
                 else:
-                    errors.append(f"{relative_name}: empty text")
-            except Exception as exc:
-                errors.append(f"{relative_name}: {exc}")
+                    future.cancel()
 
-        if not extracted:
-            error_details = "; ".join(errors) if errors else "no readable documents"
-            raise ArchiveExtractionError(
-                "Archive documents could not be parsed. "
-                f"Details: {error_details}"
+            sources = _convert_legacy_documents(
+                [path for path in docs if path not in futures],
+                output_dir=Path(convert_dir_name),
             )
+            for path in docs:
+                if path not in futures:
+                    futures[path] = submit(sources.get(path, path))
+
+            for path in docs:
+                relative_name = path.relative_to(extract_dir).as_posix()
+                try:
+                    text = _document_result(path, sources.get(path, path), futures[path], submit)
+                    if text.strip():
+                        extracted.append((relative_name, text))
+                    else:
+                        errors.append(f"{relative_name}: empty text")
+                except Exception as exc:
+                    errors.append(f"{relative_name}: {exc}")
+
+            if not extracted:
+                error_details = "; ".join(errors) if errors else "no readable documents"
+                raise ArchiveExtractionError(
+                    "Archive documents could not be parsed. "
+                    f"Details: {error_details}"
+                )
+
+            return extracted
+        finally:
+            # Nothing may keep parsing files of a temp dir that is about to
+            # be deleted, e.g. when unpacking failed halfway.
+            for future, _ in early_futures.values():
+                future.cancel()
+            for future in futures.values():
+                future.cancel()
+
+
+def _document_result(
+    path: Path,
+    source: Path,
+    future: Future[str],
+    submit: Callable[[Path], Future[str]],
+) -> str:
+    try:
+        try:
+            text = future.result()
+        except BrokenProcessPool:
+            # Another document killed a worker; the pool has been (or will
+            # be) replaced, so try this one once more.
+            text = submit(source).result()
+        if source == path or text.strip():
+            return text
+    except Exception:
+        if source == path:
+            raise
+    # A batch conversion that produced nothing usable gets the per-file path,
+    # which falls back to antiword/catdoc.
+    return submit(path).result()
+
+
+async def extract_archive_document_texts_async(
+    archive_path: Path,
+    executor: Executor | None = None,
+    document_executor: Executor | None = None,
+) -> list[tuple[str, str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(
+            extract_archive_document_texts,
+            archive_path,
+            document_executor=document_executor,
+        ),
+    )
+
+
+def _find_supported_documents(root_dir: Path) -> list[Path]:
+    docs: list[Path] = []
+    for dir_name, _, file_names in os.walk(root_dir):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() in SUPPORTED_EXTENSIONS:
+                docs.append(Path(dir_name, file_name))
+    docs.sort()
+    return docs
 
-        return extracted
 
+def _convert_legacy_documents(docs: list[Path], output_dir: Path) -> dict[Path, Path]:
+    # Files left out here are converted one by one in extract_document_text.
+    converted: dict[Path, Path] = {}
+    for target_extension in sorted(set(LIBREOFFICE_CONVERSIONS.values())):
+        batch: list[Path] = []
+        stems: set[str] = set()
+        for path in docs:
+            if LIBREOFFICE_CONVERSIONS.get(path.suffix.lower()) != target_extension:
+                continue
+            if path.stem in stems:
+                continue
+            stems.add(path.stem)
+            batch.append(path)
 
-def _extract_archive(archive_path: Path, output_dir: Path) -> None:
+        if len(batch) < 2:
+            continue
+
+        target_dir = output_dir / target_extension.lstrip(".")
+        target_dir.mkdir()
+        try:
+            converted.update(
+                convert_documents_via_libreoffice(
+                    batch,
+                    target_extension=target_extension,
+                    output_dir=target_dir,
+                )
+            )
+        except Exception:
+            continue
+
+    return converted
+
+
+def _extract_archive(
+    archive_path: Path,
+    output_dir: Path,
+    on_file: Callable[[Path], None] | None = None,
+) -> None:
     errors: list[str] = []
 
     if archive_path.suffix.lower() == ".zip":
         try:
-            _extract_zip_via_python(archive_path=archive_path, output_dir=output_dir)
+            _extract_zip_via_python(
+                archive_path=archive_path,
+                output_dir=output_dir,
+                on_file=on_file,
+            )
             return
         except Exception as exc:
             errors.append(f"zipfile: {exc}")
@@ -86,15 +271,7 @@ def _extract_archive(archive_path: Path, output_dir: Path) -> None:
 
     for command in commands:
         try:
-            subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="ignore",
-                timeout=120,
-            )
+            _run_extraction_command(command, output_dir=output_dir, on_file=on_file)
             return
         except Exception as exc:
             errors.append(f"{' '.join(command[:2])}: {exc}")
@@ -106,31 +283,89 @@ def _extract_archive(archive_path: Path, output_dir: Path) -> None:
     )
 
 
-def _extract_zip_via_python(archive_path: Path, output_dir: Path) -> None:
+def _run_extraction_command(
+    command: list[str],
+    output_dir: Path,
+    on_file: Callable[[Path], None] | None,
+) -> None:
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + ARCHIVE_EXTRACT_TIMEOUT_SECONDS
+    sizes: dict[Path, int] = {}
+
+    while True:
+        try:
+            returncode = process.wait(timeout=ARCHIVE_POLL_SECONDS)
+            break
+        except subprocess.TimeoutExpired:
+            if time.monotonic() > deadline:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(command, ARCHIVE_EXTRACT_TIMEOUT_SECONDS)
+
+        if on_file is None:
+            continue
+        # A file whose size did not change between two polls is treated as
+        # fully written.
+        for path in _find_supported_documents(output_dir):
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            if sizes.get(path) == size:
+                on_file(path)
+            sizes[path] = size
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+def _extract_zip_via_python(
+    archive_path: Path,
+    output_dir: Path,
+    on_file: Callable[[Path], None] | None = None,
+) -> None:
     with zipfile.ZipFile(str(archive_path), "r") as zf:
-        zf.extractall(str(output_dir))
+        for member in zf.infolist():
+            extracted_path = Path(zf.extract(member, str(output_dir)))
+            if on_file is not None and not member.is_dir():
+                on_file(extracted_path)
+
+
+def _file_signature(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
 
 
 def _build_extraction_commands(archive_path: Path, output_dir: Path) -> list[list[str]]:
     commands: list[list[str]] = []
 
-    unrar = shutil.which("unrar")
-    if unrar:
-        commands.append([unrar, "x", "-idq", "-o+", str(archive_path), str(output_dir)])
+    unrar_command = (
+        [_UNRAR, "x", "-idq", "-o+", str(archive_path), str(output_dir)] if _UNRAR else None
+    )
+    seven_zip_command = (
+        [_SEVEN_ZIP, "x", "-y", "-bd", f"-o{output_dir}", str(archive_path)]
+        if _SEVEN_ZIP
+        else None
+    )
 
-    seven_zip = shutil.which("7z") or shutil.which("7za")
-    if seven_zip:
-        commands.append([seven_zip, "x", "-y", "-bd", f"-o{output_dir}", str(archive_path)])
+    # unrar is the most reliable choice for RAR5; 7z starts faster and handles the rest.
+    if _is_rar5(archive_path):
+        preferred = [unrar_command, seven_zip_command]
+    else:
+        preferred = [seven_zip_command, unrar_command]
+    commands.extend(command for command in preferred if command)
 
-    bsdtar = shutil.which("bsdtar")
-    if bsdtar:
-        commands.append([bsdtar, "-xf", str(archive_path), "-C", str(output_dir)])
+    if _BSDTAR:
+        commands.append([_BSDTAR, "-xf", str(archive_path), "-C", str(output_dir)])
 
-    unar = shutil.which("unar")
-    if unar:
+    if _UNAR:
         commands.append(
             [
-                unar,
+                _UNAR,
                 "-quiet",
                 "-force-overwrite",
                 "-output-directory",
@@ -140,3 +375,11 @@ def _build_extraction_commands(archive_path: Path, output_dir: Path) -> list[lis
         )
 
     return commands
+
+
+def _is_rar5(archive_path: Path) -> bool:
+    try:
+        with open(archive_path, "rb") as archive_file:
+            return archive_file.read(len(RAR5_SIGNATURE)) == RAR5_SIGNATURE
+    except OSError:
+        return False
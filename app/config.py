@@ -19,7 +19,13 @@ class Settings:
     max_doc_chars: int = 120_000
     chunk_size: int = 12_000
     chunk_overlap: int = 1_000
-
+    max_parallel_chunks: int = 4
+    max_parallel_downloads: int = 4
+    chunk_batch_size: int = 1
+    openai_rpm: int = 0
+    openai_tpm: int = 0
+    extract_workers: int = 2
+    openai_parallelism: int = 2
 
 
 def load_settings() -> Settings:
@@ -56,6 +62,13 @@ def load_settings() -> Settings:
         max_doc_chars=max(1_000, int(os.getenv("MAX_DOC_CHARS", "120000"))),
         chunk_size=max(2_000, int(os.getenv("CHUNK_SIZE", "12000"))),
         chunk_overlap=max(0, int(os.getenv("CHUNK_OVERLAP", "1000"))),
+        max_parallel_chunks=max(1, int(os.getenv("MAX_PARALLEL_CHUNKS", "4"))),
+        max_parallel_downloads=max(1, int(os.getenv("MAX_PARALLEL_DOWNLOADS", "4"))),
+        chunk_batch_size=max(1, int(os.getenv("CHUNK_BATCH_SIZE", "1"))),
+        openai_rpm=max(0, int(os.getenv("OPENAI_RPM", "0"))),
+        openai_tpm=max(0, int(os.getenv("OPENAI_TPM", "0"))),
+        extract_workers=max(1, int(os.getenv("EXTRACT_WORKERS", "2"))),
+        openai_parallelism=max(1, int(os.getenv("OPENAI_PARALLELISM", "2"))),
     )
 
 
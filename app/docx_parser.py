@@ -1,17 +1,64 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import io
+import multiprocessing
 from datetime import time
+import re
 import shutil
 import subprocess
+import sys
 import tempfile
+import threading
+import zipfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Callable, Iterable, Iterator
 
-from docx import Document
-from openpyxl import load_workbook
-from pypdf import PdfReader
 import xlrd
 
+if TYPE_CHECKING:
+    from lxml import etree
+
 SUPPORTED_EXTENSIONS = {".docx", ".doc", ".xlsx", ".xls", ".pdf", ".odt", ".ods"}
+IN_MEMORY_EXTENSIONS = {".docx", ".xlsx", ".xls", ".pdf"}
+CLI_TEXT_TIMEOUT_SECONDS = 60
+INTERN_MAX_CELL_CHARS = 64
+DOCX_DOCUMENT_PART = "word/document.xml"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY = f"{_W}body"
+_W_P = f"{_W}p"
+_W_R = f"{_W}r"
+_W_T = f"{_W}t"
+_W_TAB = f"{_W}tab"
+_W_BR = f"{_W}br"
+_W_CR = f"{_W}cr"
+_W_PTAB = f"{_W}ptab"
+_W_NO_BREAK_HYPHEN = f"{_W}noBreakHyphen"
+_W_TYPE = f"{_W}type"
+_W_VAL = f"{_W}val"
+_W_HYPERLINK = f"{_W}hyperlink"
+_W_TBL = f"{_W}tbl"
+_W_TR = f"{_W}tr"
+_W_TC = f"{_W}tc"
+_W_TR_PR = f"{_W}trPr"
+_W_TC_PR = f"{_W}tcPr"
+_W_GRID_BEFORE = f"{_W}gridBefore"
+_W_GRID_SPAN = f"{_W}gridSpan"
+_W_V_MERGE = f"{_W}vMerge"
+
+# Workers must not be forked from the threaded bot process; forkserver is
+# not available on Windows.
+_PROCESS_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_LINE_BREAK_RE = re.compile(r"\s*[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]\s*")
+_INLINE_WHITESPACE_RE = re.compile(r"[^\S\n]+")
 
 
 class DocumentExtractionError(RuntimeError):
@@ -22,13 +69,44 @@ class UnsupportedDocumentTypeError(ValueError):
     """Raised when document type is unsupported."""
 
 
+class ExtractionProcessPool(Executor):
+    """Process pool that replaces itself once a worker has died."""
+
+    def __init__(self, max_workers: int) -> None:
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context(_PROCESS_START_METHOD),
+        )
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future[Any]:
+        with self._lock:
+            try:
+                return self._pool.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # A killed worker (out of memory, crash in a native parser)
+                # breaks the pool for good; start a fresh one.
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+                return self._pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
 def _clean_line(line: str) -> str:
-    return " ".join(line.replace("\xa0", " ").split()).strip()
+    return _WHITESPACE_RE.sub(" ", line).strip()
 
 
 def _normalize_text(text: str) -> str:
-    lines = (_clean_line(line) for line in text.splitlines())
-    return "\n".join(line for line in lines if line)
+    # Whitespace runs with a line break become one newline, others one space.
+    text = _LINE_BREAK_RE.sub("\n", text)
+    return _INLINE_WHITESPACE_RE.sub(" ", text).strip()
 
 
 def extract_document_text(file_path: Path) -> str:
@@ -53,8 +131,200 @@ def extract_document_text(file_path: Path) -> str:
     )
 
 
-def extract_docx_text(file_path: Path) -> str:
-    doc = Document(str(file_path))
+async def extract_document_text_async(
+    file_path: Path,
+    executor: Executor | None = None,
+    thread_executor: Executor | None = None,
+) -> str:
+    # Pure-Python formats go to the given executor (usually a process pool);
+    # LibreOffice and the CLI converters wait on subprocesses in a thread.
+    if executor is not None and file_path.suffix.lower() in IN_MEMORY_EXTENSIONS:
+        return await _run_in_process_pool(executor, extract_document_text, file_path)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(thread_executor, extract_document_text, file_path)
+
+
+def extract_document_bytes(data: bytes, extension: str) -> str:
+    suffix = extension.lower()
+    if suffix == ".docx":
+        return extract_docx_text(io.BytesIO(data))
+    if suffix == ".xlsx":
+        return extract_xlsx_text(io.BytesIO(data))
+    if suffix == ".xls":
+        return extract_xls_text(io.BytesIO(data))
+    if suffix == ".pdf":
+        return extract_pdf_text(io.BytesIO(data))
+
+    # LibreOffice and the CLI converters only read real files.
+    with tempfile.TemporaryDirectory(prefix="document_bytes_") as tmp_dir_name:
+        file_path = Path(tmp_dir_name) / f"document{suffix}"
+        file_path.write_bytes(data)
+        return extract_document_text(file_path)
+
+
+async def extract_document_bytes_async(
+    data: bytes,
+    extension: str,
+    executor: Executor | None = None,
+    thread_executor: Executor | None = None,
+) -> str:
+    if executor is not None and extension.lower() in IN_MEMORY_EXTENSIONS:
+        return await _run_in_process_pool(executor, extract_document_bytes, data, extension)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(thread_executor, extract_document_bytes, data, extension)
+
+
+async def _run_in_process_pool(executor: Executor, func: Callable[..., str], *args: Any) -> str:
+    # A dying worker fails every job queued on the pool, not just its own, so
+    # each job gets one more try on the replacement pool.
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        pass
+    try:
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool as exc:
+        raise DocumentExtractionError("Document parser process crashed") from exc
+
+
+def _source_arg(source: Path | IO[bytes]) -> str | IO[bytes]:
+    if isinstance(source, Path):
+        return str(source)
+    source.seek(0)
+    return source
+
+
+def extract_docx_text(file_path: Path | IO[bytes]) -> str:
+    with zipfile.ZipFile(_source_arg(file_path)) as archive:
+        if DOCX_DOCUMENT_PART not in archive.namelist():
+            return _extract_docx_text_via_python_docx(file_path)
+        with archive.open(DOCX_DOCUMENT_PART) as document_xml:
+            paragraphs, table_rows = _read_docx_body(document_xml)
+
+    return "\n".join(paragraphs + table_rows)
+
+
+def _read_docx_body(document_xml: IO[bytes]) -> tuple[list[str], list[str]]:
+    from lxml import etree
+
+    paragraphs: list[str] = []
+    table_rows: list[str] = []
+
+    # Same entity handling as python-docx's parser: never expand external
+    # entities from an uploaded file into the text sent to the model.
+    events = etree.iterparse(
+        document_xml,
+        events=("end",),
+        tag=(_W_P, _W_TBL),
+        resolve_entities=False,
+        no_network=True,
+    )
+    try:
+        for _, element in events:
+            parent = element.getparent()
+            if parent is None or parent.tag != _W_BODY:
+                continue
+
+            if element.tag == _W_P:
+                text = _clean_line(_docx_paragraph_text(element))
+                if text:
+                    paragraphs.append(text)
+            else:
+                for cells in _docx_table_rows(element):
+                    cells = [cell for cell in cells if cell]
+                    if cells:
+                        table_rows.append(" | ".join(cells))
+
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+    except etree.XMLSyntaxError as exc:
+        raise DocumentExtractionError(f"Cannot parse .docx file: {exc}") from exc
+
+    return paragraphs, table_rows
+
+
+def _docx_table_rows(table: etree._Element) -> Iterator[list[str]]:
+    # Mirrors python-docx row.cells: a cell spanning several grid columns is
+    # repeated for each of them, and a vertically merged continuation cell
+    # repeats the cell above it.
+    cells_above: dict[int, list[str]] = {}
+    for row in table.iterchildren(_W_TR):
+        grid_offset = _docx_int_property(row, _W_TR_PR, _W_GRID_BEFORE, default=0)
+        row_cells: dict[int, list[str]] = {}
+        texts: list[str] = []
+        for cell in row.iterchildren(_W_TC):
+            grid_span = _docx_int_property(cell, _W_TC_PR, _W_GRID_SPAN, default=1)
+            if _docx_v_merge(cell) == "continue":
+                cell_texts = cells_above.get(grid_offset, [])
+            else:
+                text = _clean_line(
+                    "\n".join(
+                        _docx_paragraph_text(paragraph)
+                        for paragraph in cell.iterchildren(_W_P)
+                    )
+                )
+                cell_texts = [text] * grid_span
+            row_cells[grid_offset] = cell_texts
+            texts.extend(cell_texts)
+            grid_offset += grid_span
+        cells_above = row_cells
+        yield texts
+
+
+def _docx_int_property(
+    element: etree._Element,
+    properties_tag: str,
+    property_tag: str,
+    default: int,
+) -> int:
+    node = element.find(f"{properties_tag}/{property_tag}")
+    if node is None:
+        return default
+    try:
+        return int(node.get(_W_VAL, default))
+    except ValueError:
+        return default
+
+
+def _docx_v_merge(cell: etree._Element) -> str | None:
+    node = cell.find(f"{_W_TC_PR}/{_W_V_MERGE}")
+    if node is None:
+        return None
+    # An empty w:vMerge means "continue".
+    return node.get(_W_VAL, "continue")
+
+
+def _docx_paragraph_text(paragraph: etree._Element) -> str:
+    parts: list[str] = []
+    for child in paragraph.iterchildren(_W_R, _W_HYPERLINK):
+        runs = child.iterchildren(_W_R) if child.tag == _W_HYPERLINK else (child,)
+        for run in runs:
+            for item in run.iterchildren(
+                _W_T, _W_TAB, _W_PTAB, _W_BR, _W_CR, _W_NO_BREAK_HYPHEN
+            ):
+                parts.append(_docx_run_item_text(item))
+    return "".join(parts)
+
+
+def _docx_run_item_text(item: etree._Element) -> str:
+    # Same text equivalents as python-docx's run.text.
+    if item.tag == _W_T:
+        return item.text or ""
+    if item.tag == _W_NO_BREAK_HYPHEN:
+        return "-"
+    if item.tag == _W_BR:
+        return "\n" if item.get(_W_TYPE, "textWrapping") == "textWrapping" else ""
+    if item.tag == _W_CR:
+        return "\n"
+    return "\t"
+
+
+def _extract_docx_text_via_python_docx(file_path: Path | IO[bytes]) -> str:
+    from docx import Document
+
+    doc = Document(_source_arg(file_path))
     blocks: list[str] = []
 
     for paragraph in doc.paragraphs:
@@ -69,7 +339,7 @@ def extract_docx_text(file_path: Path) -> str:
             if cells:
                 blocks.append(" | ".join(cells))
 
-    return _normalize_text("\n".join(blocks))
+    return "\n".join(blocks)
 
 
 def extract_doc_text(file_path: Path) -> str:
@@ -95,33 +365,68 @@ def extract_doc_text(file_path: Path) -> str:
     )
 
 
-def extract_xlsx_text(file_path: Path) -> str:
-    workbook = load_workbook(filename=str(file_path), data_only=True, read_only=True)
+def extract_xlsx_text(file_path: Path | IO[bytes]) -> str:
+    try:
+        sheets = _read_xlsx_via_calamine(file_path)
+    except Exception:
+        sheets = _read_xlsx_via_openpyxl(file_path)
+
     blocks: list[str] = []
 
-    for sheet in workbook.worksheets:
+    for title, rows in sheets:
         sheet_lines: list[str] = []
-        for row in sheet.iter_rows(values_only=True):
+        for row in rows:
             values = [_cell_to_text(value) for value in row]
             values = [value for value in values if value]
             if values:
                 sheet_lines.append(" | ".join(values))
 
         if sheet_lines:
-            blocks.append(f"Лист: {sheet.title}")
+            blocks.append(f"Лист: {_clean_line(title)}")
             blocks.extend(sheet_lines)
 
-    workbook.close()
-
-    text = _normalize_text("\n".join(blocks))
+    text = "\n".join(blocks)
     if not text:
         raise DocumentExtractionError("Cannot parse .xlsx file: workbook is empty")
     return text
 
 
-def extract_xls_text(file_path: Path) -> str:
+def _read_xlsx_via_calamine(
+    file_path: Path | IO[bytes],
+) -> list[tuple[str, list[list[object]]]]:
+    from python_calamine import CalamineWorkbook
+
+    source = _source_arg(file_path)
+    if isinstance(source, str):
+        workbook = CalamineWorkbook.from_path(source)
+    else:
+        workbook = CalamineWorkbook.from_filelike(source)
+    return [
+        (name, workbook.get_sheet_by_name(name).to_python())
+        for name in workbook.sheet_names
+    ]
+
+
+def _read_xlsx_via_openpyxl(
+    file_path: Path | IO[bytes],
+) -> Iterator[tuple[str, Iterable[tuple[object, ...]]]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename=_source_arg(file_path), data_only=True, read_only=True)
     try:
-        workbook = xlrd.open_workbook(filename=str(file_path), on_demand=True)
+        for sheet in workbook.worksheets:
+            yield sheet.title, sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def extract_xls_text(file_path: Path | IO[bytes]) -> str:
+    try:
+        if isinstance(file_path, Path):
+            workbook = xlrd.open_workbook(filename=str(file_path), on_demand=True)
+        else:
+            file_path.seek(0)
+            workbook = xlrd.open_workbook(file_contents=file_path.read(), on_demand=True)
     except Exception as exc:
         raise DocumentExtractionError(f"Cannot open .xls file: {exc}") from exc
 
@@ -145,20 +450,22 @@ def extract_xls_text(file_path: Path) -> str:
                     sheet_lines.append(" | ".join(values))
 
             if sheet_lines:
-                blocks.append(f"Лист: {sheet_name}")
+                blocks.append(f"Лист: {_clean_line(sheet_name)}")
                 blocks.extend(sheet_lines)
     finally:
         workbook.release_resources()
 
-    text = _normalize_text("\n".join(blocks))
+    text = "\n".join(blocks)
     if not text:
         raise DocumentExtractionError("Cannot parse .xls file: workbook is empty")
     return text
 
 
-def extract_pdf_text(file_path: Path) -> str:
+def extract_pdf_text(file_path: Path | IO[bytes]) -> str:
+    from pypdf import PdfReader
+
     try:
-        reader = PdfReader(str(file_path))
+        reader = PdfReader(_source_arg(file_path))
     except Exception as exc:
         raise DocumentExtractionError(f"Cannot open .pdf file: {exc}") from exc
 
@@ -168,6 +475,8 @@ def extract_pdf_text(file_path: Path) -> str:
         except Exception as exc:
             raise DocumentExtractionError(f"Cannot decrypt .pdf file: {exc}") from exc
 
+    # Pages share the reader's stream and resolve objects lazily through it,
+    # so they must be extracted one at a time.
     blocks: list[str] = []
     for index, page in enumerate(reader.pages, start=1):
         try:
@@ -179,7 +488,7 @@ def extract_pdf_text(file_path: Path) -> str:
             blocks.append(f"Страница {index}")
             blocks.append(normalized)
 
-    text = _normalize_text("\n".join(blocks))
+    text = "\n".join(blocks)
     if not text:
         raise DocumentExtractionError(
             "Cannot parse .pdf file: no extractable text (possibly scanned document)"
@@ -205,6 +514,51 @@ def extract_ods_text(file_path: Path) -> str:
         ) from exc
 
 
+def convert_documents_via_libreoffice(
+    file_paths: list[Path],
+    target_extension: str,
+    output_dir: Path,
+) -> dict[Path, Path]:
+    office_binary = _find_binary("soffice", "libreoffice")
+    if not office_binary:
+        raise FileNotFoundError("LibreOffice binary not found (soffice/libreoffice)")
+
+    with tempfile.TemporaryDirectory(prefix="soffice_profile_") as profile_dir_name:
+        command = [
+            office_binary,
+            _libreoffice_profile_arg(Path(profile_dir_name)),
+            "--headless",
+            "--convert-to",
+            target_extension.lstrip("."),
+            "--outdir",
+            str(output_dir),
+            *(str(path) for path in file_paths),
+        ]
+        subprocess.run(
+            command,
+            check=True,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            timeout=90 * len(file_paths),
+        )
+
+    converted: dict[Path, Path] = {}
+    for path in file_paths:
+        candidate = output_dir / f"{path.stem}{target_extension}"
+        if candidate.exists():
+            converted[path] = candidate
+    return converted
+
+
+def _libreoffice_profile_arg(profile_dir: Path) -> str:
+    # soffice calls run concurrently; with the shared default profile a second
+    # --convert-to hands its job to the running instance or fails on the
+    # profile lock, so every call gets its own.
+    return f"-env:UserInstallation={profile_dir.resolve().as_uri()}"
+
+
 def _extract_doc_via_libreoffice(file_path: Path) -> str:
     office_binary = _find_binary("soffice", "libreoffice")
     if not office_binary:
@@ -214,6 +568,7 @@ def _extract_doc_via_libreoffice(file_path: Path) -> str:
         tmp_dir = Path(tmp_dir_name)
         command = [
             office_binary,
+            _libreoffice_profile_arg(tmp_dir / "profile"),
             "--headless",
             "--convert-to",
             "docx",
@@ -253,6 +608,7 @@ def _extract_ods_via_libreoffice(file_path: Path) -> str:
         tmp_dir = Path(tmp_dir_name)
         command = [
             office_binary,
+            _libreoffice_profile_arg(tmp_dir / "profile"),
             "--headless",
             "--convert-to",
             "xlsx",
@@ -284,29 +640,41 @@ def _extract_ods_via_libreoffice(file_path: Path) -> str:
 
 
 def _extract_doc_via_cli_text(tool: str, file_path: Path) -> str:
-    binary = shutil.which(tool)
+    binary = _find_binary(tool)
     if not binary:
         raise FileNotFoundError(f"{tool} binary not found")
 
-    result = subprocess.run(
-        [binary, str(file_path)],
-        check=True,
-        capture_output=True,
-        timeout=60,
-    )
-    text = _normalize_text(_decode_text_output(result.stdout))
+    command = [binary, str(file_path)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    timer = threading.Timer(CLI_TEXT_TIMEOUT_SECONDS, process.kill)
+    timer.start()
+    try:
+        assert process.stdout is not None
+        lines = [
+            line
+            for raw_line in process.stdout
+            if (line := _normalize_text(_decode_text_output(raw_line)))
+        ]
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+        if process.stdout is not None:
+            process.stdout.close()
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+
+    text = "\n".join(lines)
     if not text:
         raise DocumentExtractionError(f"{tool} returned empty output")
     return text
 
 
 def _decode_text_output(payload: bytes) -> str:
-    for encoding in ("utf-8", "cp1251", "latin-1"):
-        try:
-            return payload.decode(encoding)
-        except UnicodeDecodeError:
-            continue
-    return payload.decode("utf-8", errors="ignore")
+    try:
+        return payload.decode("utf-8")
+    except UnicodeDecodeError:
+        return payload.decode("cp1251", errors="replace")
 
 
 def _cell_to_text(value: object) -> str:
@@ -314,7 +682,12 @@ def _cell_to_text(value: object) -> str:
         return ""
     if isinstance(value, bool):
         return "Да" if value else "Нет"
-    return _clean_line(str(value))
+    if isinstance(value, float) and value.is_integer():
+        text = str(int(value))
+    else:
+        text = _clean_line(str(value))
+    # Spreadsheets repeat short labels and flags across many cells.
+    return sys.intern(text) if len(text) <= INTERN_MAX_CELL_CHARS else text
 
 
 def _xls_cell_to_text(cell: xlrd.sheet.Cell, datemode: int) -> str:
@@ -342,6 +715,7 @@ def _xls_cell_to_text(cell: xlrd.sheet.Cell, datemode: int) -> str:
     return _clean_line(str(cell.value))
 
 
+@functools.lru_cache(maxsize=None)
 def _find_binary(*candidates: str) -> str | None:
     for candidate in candidates:
         found = shutil.which(candidate)
@@ -6,6 +6,7 @@ import logging
 import re
 import tempfile
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
@@ -27,13 +28,14 @@ from maxapi.types.message import MessageBody
 from .archive_parser import (
     ArchiveExtractionError,
     SUPPORTED_ARCHIVE_EXTENSIONS,
-    extract_archive_document_texts,
+    extract_archive_document_texts_async,
 )
 from .config import Settings
 from .docx_parser import (
     SUPPORTED_EXTENSIONS,
     DocumentExtractionError,
-    extract_document_text,
+    ExtractionProcessPool,
+    extract_document_text_async,
 )
 from .summarizer import TenderSummarizer
 
@@ -74,14 +76,14 @@ PROCUREMENT_LINK_PATTERN = re.compile(
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentPayload:
     download_url: str
     file_name: str
     extension: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingFileGroup:
     status_mid: str
     chat_id: int
@@ -91,7 +93,7 @@ class PendingFileGroup:
     task: asyncio.Task[None] | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class RecentChatText:
     message_seq: int
     text: str
@@ -102,13 +104,17 @@ class RecentChatText:
 class TenderMaxBot:
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
-        self.summarizer = TenderSummarizer(
+        self.summarizer = TenderSummarizer.get_or_create(
             api_key=settings.openai_api_key,
             model=settings.openai_model,
             language=settings.summary_language,
             max_doc_chars=settings.max_doc_chars,
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
+            max_parallel_chunks=settings.max_parallel_chunks,
+            chunk_batch_size=settings.chunk_batch_size,
+            requests_per_minute=settings.openai_rpm,
+            tokens_per_minute=settings.openai_tpm,
         )
         self.bot = Bot(token=settings.max_bot_token)
         self.dp = Dispatcher()
@@ -120,6 +126,22 @@ class TenderMaxBot:
         self.recent_chat_texts_lock = asyncio.Lock()
         self.denied_chat_ids: set[int] = set()
         self.denied_chat_ids_lock = asyncio.Lock()
+        self.download_semaphore = asyncio.BoundedSemaphore(settings.max_parallel_downloads)
+        # Summaries are capped separately so slow LLM calls never hold
+        # download slots and downloads never wait for a summary to finish.
+        self.summarize_semaphore = asyncio.BoundedSemaphore(settings.openai_parallelism)
+        self.extract_pool = ExtractionProcessPool(max_workers=settings.extract_workers)
+        self.extract_threads = ThreadPoolExecutor(
+            max_workers=settings.extract_workers,
+            thread_name_prefix="extract",
+        )
+        # An archive holds its thread while unpacking and waiting for its
+        # documents, so archives get their own threads, one per download slot,
+        # and never starve .doc/.odt/.ods extraction.
+        self.archive_threads = ThreadPoolExecutor(
+            max_workers=settings.max_parallel_downloads,
+            thread_name_prefix="archive",
+        )
 
     def _register_handlers(self) -> None:
         self.dp.bot_added()(self.handle_bot_added)
@@ -134,18 +156,10 @@ class TenderMaxBot:
     # ------------------------------------------------------------------
 
     async def handle_bot_added(self, event: BotAdded) -> None:
-        print(
-            "[bot-membership]"
-            f" chat_id={event.chat_id}"
-            f" action=added"
-        )
+        logger.info("[bot-membership] chat_id=%s action=added", event.chat_id)
 
     async def handle_bot_removed(self, event: BotRemoved) -> None:
-        print(
-            "[bot-membership]"
-            f" chat_id={event.chat_id}"
-            f" action=removed"
-        )
+        logger.info("[bot-membership] chat_id=%s action=removed", event.chat_id)
 
     async def handle_bot_started(self, event: BotStarted) -> None:
         await event.bot.send_message(
@@ -420,16 +434,17 @@ class TenderMaxBot:
         self,
         payload: DocumentPayload,
     ) -> list[tuple[str, str]]:
-        if payload.extension in SUPPORTED_EXTENSIONS:
-            text = await self._download_and_extract_text(payload)
-            if not text.strip():
-                raise DocumentExtractionError(
-                    f"{payload.file_name}: пустой текст"
-                )
-            return [(payload.file_name, text)]
+        async with self.download_semaphore:
+            if payload.extension in SUPPORTED_EXTENSIONS:
+                text = await self._download_and_extract_text(payload)
+                if not text.strip():
+                    raise DocumentExtractionError(
+                        f"{payload.file_name}: пустой текст"
+                    )
+                return [(payload.file_name, text)]
 
-        if payload.extension in SUPPORTED_ARCHIVE_EXTENSIONS:
-            return await self._download_and_extract_archive_texts(payload)
+            if payload.extension in SUPPORTED_ARCHIVE_EXTENSIONS:
+                return await self._download_and_extract_archive_texts(payload)
 
         raise DocumentExtractionError(
             f"{payload.file_name}: unsupported extension {payload.extension}"
@@ -447,9 +462,13 @@ class TenderMaxBot:
                 temp_path = Path(temp_file.name)
 
             await _download_file(payload.download_url, temp_path)
-            return extract_document_text(temp_path)
+            return await extract_document_text_async(
+                temp_path,
+                executor=self.extract_pool,
+                thread_executor=self.extract_threads,
+            )
         finally:
-            if temp_path and temp_path.exists():
+            if temp_path is not None:
                 temp_path.unlink(missing_ok=True)
 
     async def _download_and_extract_archive_texts(
@@ -465,13 +484,17 @@ class TenderMaxBot:
                 temp_path = Path(temp_file.name)
 
             await _download_file(payload.download_url, temp_path)
-            extracted = extract_archive_document_texts(temp_path)
+            extracted = await extract_archive_document_texts_async(
+                temp_path,
+                executor=self.archive_threads,
+                document_executor=self.extract_pool,
+            )
             return [
                 (f"{payload.file_name} / {inner_name}", text)
                 for inner_name, text in extracted
             ]
         finally:
-            if temp_path and temp_path.exists():
+            if temp_path is not None:
                 temp_path.unlink(missing_ok=True)
 
     # ------------------------------------------------------------------
@@ -485,10 +508,11 @@ class TenderMaxBot:
         context_text: str | None = None,
     ) -> str:
         if len(extracted_parts) == 1 and not context_text:
-            return await self.summarizer.summarize(
-                text=extracted_parts[0][1],
-                file_name=extracted_parts[0][0],
-            )
+            async with self.summarize_semaphore:
+                return await self.summarizer.summarize(
+                    text=extracted_parts[0][1],
+                    file_name=extracted_parts[0][0],
+                )
 
         sections: list[str] = []
         if context_text:
@@ -503,10 +527,11 @@ class TenderMaxBot:
         )
         combined_text = "\n\n".join(sections)
 
-        return await self.summarizer.summarize(
-            text=combined_text,
-            file_name=fallback_name,
-        )
+        async with self.summarize_semaphore:
+            return await self.summarizer.summarize(
+                text=combined_text,
+                file_name=fallback_name,
+            )
 
     async def _build_combined_summary(
         self,
@@ -516,12 +541,17 @@ class TenderMaxBot:
         extracted_parts: list[tuple[str, str]] = []
         failed_files: list[str] = []
 
-        for payload in documents:
-            try:
-                parts = await self._extract_payload_texts(payload)
-                extracted_parts.extend(parts)
-            except Exception as exc:
-                failed_files.append(f"{payload.file_name}: {exc}")
+        results = await asyncio.gather(
+            *(self._extract_payload_texts(payload) for payload in documents),
+            return_exceptions=True,
+        )
+        for payload, result in zip(documents, results):
+            if isinstance(result, Exception):
+                failed_files.append(f"{payload.file_name}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                extracted_parts.extend(result)
 
         if not extracted_parts:
             raise DocumentExtractionError("No files were extracted")
@@ -619,11 +649,11 @@ class TenderMaxBot:
             return True
 
         body = message.body
-        if body:
-            print(
-                "[group-message]"
-                f" chat_id={chat_id}"
-                f" message_mid={body.mid}"
+        if body and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[group-message] chat_id=%s message_mid=%s",
+                chat_id,
+                body.mid,
             )
 
         if not self.settings.whitelist_chat_ids:
@@ -665,7 +695,13 @@ class TenderMaxBot:
     # ------------------------------------------------------------------
 
     async def run(self) -> None:
-        await self.dp.start_polling(self.bot)
+        try:
+            await self.dp.start_polling(self.bot)
+        finally:
+            await self.summarizer.close()
+            self.extract_pool.shutdown(wait=False, cancel_futures=True)
+            self.extract_threads.shutdown(wait=False, cancel_futures=True)
+            self.archive_threads.shutdown(wait=False, cancel_futures=True)
 
 
 # ======================================================================
@@ -692,20 +728,21 @@ def _split_message_text(text: str, limit: int = 3800) -> list[str]:
 
     for paragraph in text.split("\n"):
         line = paragraph.strip()
-        candidate_len = current_len + len(line) + 1
+        line_len = len(line)
+        candidate_len = current_len + line_len + 1
 
         if candidate_len > limit and current:
             parts.append("\n".join(current).strip())
             current = [line]
-            current_len = len(line)
+            current_len = line_len
             continue
 
-        if len(line) > limit:
+        if line_len > limit:
             if current:
                 parts.append("\n".join(current).strip())
                 current = []
                 current_len = 0
-            for i in range(0, len(line), limit):
+            for i in range(0, line_len, limit):
                 parts.append(line[i : i + limit])
             continue
 
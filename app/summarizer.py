@@ -1,11 +1,108 @@
 from __future__ import annotations
 
-from typing import Iterable
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, ClassVar, TypeVar
 
-from openai import AsyncOpenAI
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionMessageParam
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = 1024
+CHARS_PER_TOKEN_ESTIMATE = 4
+COMPLETION_TOKENS_ESTIMATE = 500
+# Telegram allows about 20 messages per minute in a group, edits included.
+PROGRESS_INTERVAL_SECONDS = 4.0
+RETRY_ATTEMPTS = 5
+NO_TEXT_SUMMARY = "Не удалось извлечь текст из файла."
+NO_ANSWER_SUMMARY = "Не удалось сформировать саммари."
+FALLBACK_SUMMARIES = (NO_TEXT_SUMMARY, NO_ANSWER_SUMMARY)
+RETRY_MIN_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+_LINE_BREAK_RE = re.compile(r"\s*[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]\s*")
+
+ProgressCallback = Callable[[str], Awaitable[None]]
+T = TypeVar("T")
+
+
+class RateLimiter:
+    """Per-minute request and token budgets for the OpenAI API; 0 disables a limit."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_credits = float(requests_per_minute)
+        self.token_credits = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def reserve(self, tokens: int) -> int:
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        else:
+            tokens = 0
+
+        # The lock keeps waiting callers in FIFO order.
+        async with self.lock:
+            while True:
+                self._refill()
+                delay = 0.0
+                if self.requests_per_minute and self.request_credits < 1:
+                    delay = (1 - self.request_credits) * 60 / self.requests_per_minute
+                if tokens and self.token_credits < tokens:
+                    delay = max(delay, (tokens - self.token_credits) * 60 / self.tokens_per_minute)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            self.request_credits -= 1
+            self.token_credits -= tokens
+        return tokens
+
+    def refund(self, tokens: int) -> None:
+        # A negative refund charges tokens used beyond the reservation.
+        if not self.tokens_per_minute:
+            return
+        self._refill()
+        self.token_credits = min(float(self.tokens_per_minute), self.token_credits + tokens)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        if self.requests_per_minute:
+            self.request_credits = min(
+                float(self.requests_per_minute),
+                self.request_credits + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self.token_credits = min(
+                float(self.tokens_per_minute),
+                self.token_credits + elapsed * self.tokens_per_minute / 60,
+            )
 
 
 class TenderSummarizer:
+    _instances: ClassVar[dict[tuple[tuple[str, Any], ...], TenderSummarizer]] = {}
+
     def __init__(
         self,
         api_key: str,
@@ -14,51 +111,132 @@ class TenderSummarizer:
         max_doc_chars: int,
         chunk_size: int,
         chunk_overlap: int,
+        max_parallel_chunks: int = 4,
+        chunk_batch_size: int = 1,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
     ) -> None:
-        self.client = AsyncOpenAI(api_key=api_key)
+        self.http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        # Retries are done in _with_retry, so the client must not retry on its own.
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=self.http_client,
+            max_retries=0,
+        )
         self.model = model
         self.language = language
         self.max_doc_chars = max_doc_chars
         self.chunk_size = chunk_size
         self.chunk_overlap = min(chunk_overlap, max(0, chunk_size // 2))
+        self.chunk_semaphore = asyncio.Semaphore(max(1, max_parallel_chunks))
+        self.chunk_batch_size = max(1, chunk_batch_size)
+        self.response_cache: OrderedDict[str, str] = OrderedDict()
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=max(0, requests_per_minute),
+            tokens_per_minute=max(0, tokens_per_minute),
+        )
+        self.cache_key: tuple[tuple[str, Any], ...] | None = None
+        self.ref_count = 0
+
+    @classmethod
+    def get_or_create(cls, **kwargs: Any) -> TenderSummarizer:
+        # Bots built with the same settings share one client and its warm
+        # connection pool; each close() releases one reference.
+        key = tuple(sorted(kwargs.items()))
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = cls(**kwargs)
+            instance.cache_key = key
+            cls._instances[key] = instance
+        instance.ref_count += 1
+        return instance
 
-    async def summarize(self, text: str, file_name: str | None = None) -> str:
-        normalized = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+    async def close(self) -> None:
+        if self.cache_key is not None:
+            self.ref_count -= 1
+            if self.ref_count > 0:
+                return
+            self._instances.pop(self.cache_key, None)
+            self.cache_key = None
+        await self.client.close()
+
+    async def summarize(
+        self,
+        text: str,
+        file_name: str | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> str:
+        if len(text) > self.max_doc_chars * 2:
+            text = text[: self.max_doc_chars * 2]
+
+        normalized = _LINE_BREAK_RE.sub("\n", text).strip()
         if not normalized:
-            return "Не удалось извлечь текст из файла."
+            return NO_TEXT_SUMMARY
 
         if len(normalized) > self.max_doc_chars:
             normalized = normalized[: self.max_doc_chars]
 
-        chunks = list(self._split_text(normalized))
+        bounds = self._chunk_bounds(len(normalized))
 
-        if len(chunks) == 1:
-            return await self._final_summary(chunks[0], file_name=file_name)
+        if len(bounds) == 1:
+            return await self._final_summary(
+                normalized,
+                file_name=file_name,
+                on_progress=on_progress,
+            )
 
-        partials: list[str] = []
-        for idx, chunk in enumerate(chunks, start=1):
-            partial = await self._chunk_summary(chunk, idx=idx, total=len(chunks))
-            partials.append(partial)
+        batch_size = self.chunk_batch_size
+        partials = await asyncio.gather(
+            *(
+                self._chunk_summary(
+                    normalized,
+                    bounds[offset : offset + batch_size],
+                    first_idx=offset + 1,
+                    total=len(bounds),
+                )
+                for offset in range(0, len(bounds), batch_size)
+            )
+        )
 
         combined = "\n\n".join(partials)
-        return await self._final_summary(combined, file_name=file_name)
+        return await self._final_summary(
+            combined,
+            file_name=file_name,
+            on_progress=on_progress,
+        )
 
-    def _split_text(self, text: str) -> Iterable[str]:
-        if len(text) <= self.chunk_size:
-            yield text
-            return
+    def _chunk_bounds(self, length: int) -> list[tuple[int, int]]:
+        if length <= self.chunk_size:
+            return [(0, length)]
 
-        start = 0
-        while start < len(text):
-            end = min(len(text), start + self.chunk_size)
-            yield text[start:end]
-            if end >= len(text):
-                break
-            start = max(0, end - self.chunk_overlap)
+        step = self.chunk_size - self.chunk_overlap
+        count = math.ceil((length - self.chunk_overlap) / step)
+        return [
+            (i * step, min(length, i * step + self.chunk_size))
+            for i in range(count)
+        ]
 
-    async def _chunk_summary(self, chunk: str, idx: int, total: int) -> str:
+    async def _chunk_summary(
+        self,
+        text: str,
+        bounds: list[tuple[int, int]],
+        first_idx: int,
+        total: int,
+    ) -> str:
+        last_idx = first_idx + len(bounds) - 1
+        if last_idx == first_idx:
+            position = f"часть тендерной документации ({first_idx}/{total})"
+        else:
+            position = (
+                f"части {first_idx}-{last_idx} из {total} тендерной документации, "
+                "каждая начинается с заголовка === ЧАСТЬ N/M ==="
+            )
         prompt = (
-            f"Ты анализируешь часть тендерной документации ({idx}/{total}). "
+            f"Ты анализируешь {position}. "
             "Верни только факты. Если данных нет, так и напиши.\n\n"
             "КРИТИЧЕСКИ ВАЖНО: максимально полно извлекай требования к исполнителю работ.\n"
             "Особенно отметь:\n"
@@ -86,9 +264,23 @@ class TenderSummarizer:
             "взяты контакты\n"
             "10) Ключевые риски/неясности"
         )
-        return await self._ask_llm(prompt, chunk)
+        async with self.chunk_semaphore:
+            if len(bounds) == 1:
+                start, end = bounds[0]
+                content = text[start:end]
+            else:
+                content = "\n\n".join(
+                    f"=== ЧАСТЬ {idx}/{total} ===\n{text[start:end]}"
+                    for idx, (start, end) in enumerate(bounds, start=first_idx)
+                )
+            return await self._ask_llm(prompt, content)
 
-    async def _final_summary(self, content: str, file_name: str | None = None) -> str:
+    async def _final_summary(
+        self,
+        content: str,
+        file_name: str | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> str:
         title = f"Файл: {file_name}\n\n" if file_name else ""
         prompt = (
             f"Сформируй итоговое саммари на языке: {self.language}.\n"
@@ -132,22 +324,113 @@ class TenderSummarizer:
             "Если контактов нет, так и напиши: 'Контакты в документах не найдены'.\n"
             "Если данных нет, явно укажи это. Ничего не придумывай."
         )
-        summary = await self._ask_llm(prompt, content)
+        summary = await self._ask_llm(prompt, content, on_progress=on_progress)
         return f"{title}{summary}".strip()
 
-    async def _ask_llm(self, instruction: str, content: str) -> str:
-        completion = await self.client.chat.completions.create(
-            model=self.model,
-            temperature=0.2,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Ты помощник по анализу тендерной документации.",
-                },
-                {
-                    "role": "user",
-                    "content": f"{instruction}\n\nТекст:\n{content}",
-                },
-            ],
+    async def _ask_llm(
+        self,
+        instruction: str,
+        content: str,
+        on_progress: ProgressCallback | None = None,
+    ) -> str:
+        cache_key = hashlib.sha256(
+            f"{self.model}|{instruction}|{content}".encode("utf-8")
+        ).hexdigest()
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            self.response_cache.move_to_end(cache_key)
+            return cached
+
+        user_content = f"{instruction}\n\nТекст:\n{content}"
+        messages: list[ChatCompletionMessageParam] = [
+            {
+                "role": "system",
+                "content": "Ты помощник по анализу тендерной документации.",
+            },
+            {
+                "role": "user",
+                "content": user_content,
+            },
+        ]
+        reserved = await self.rate_limiter.reserve(
+            len(user_content) // CHARS_PER_TOKEN_ESTIMATE + COMPLETION_TOKENS_ESTIMATE
         )
-        return completion.choices[0].message.content or "Не удалось сформировать саммари."
+        try:
+            if on_progress is None:
+                completion = await self._with_retry(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        temperature=0.2,
+                        messages=messages,
+                    )
+                )
+                answer = completion.choices[0].message.content
+                usage = completion.usage
+            else:
+                answer, usage = await self._stream_completion(messages, on_progress)
+        except Exception:
+            self.rate_limiter.refund(reserved)
+            raise
+
+        if usage is not None:
+            self.rate_limiter.refund(reserved - usage.total_tokens)
+        if not answer:
+            return NO_ANSWER_SUMMARY
+
+        self.response_cache[cache_key] = answer
+        if len(self.response_cache) > RESPONSE_CACHE_SIZE:
+            self.response_cache.popitem(last=False)
+        return answer
+
+    async def _stream_completion(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        on_progress: ProgressCallback,
+    ) -> tuple[str, CompletionUsage | None]:
+        stream = await self._with_retry(
+            lambda: self.client.chat.completions.create(
+                model=self.model,
+                temperature=0.2,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        )
+        parts: list[str] = []
+        usage: CompletionUsage | None = None
+        next_progress_at = time.monotonic() + PROGRESS_INTERVAL_SECONDS
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+
+            parts.append(chunk.choices[0].delta.content)
+            # Partial text is reported at most once per interval.
+            now = time.monotonic()
+            if now >= next_progress_at:
+                next_progress_at = now + PROGRESS_INTERVAL_SECONDS
+                await on_progress("".join(parts))
+
+        return "".join(parts), usage
+
+    async def _with_retry(self, request: Callable[[], Awaitable[T]]) -> T:
+        # Transient errors are retried with jittered exponential backoff.
+        # The rate limiter reservation is made once by the caller.
+        for attempt in range(1, RETRY_ATTEMPTS):
+            try:
+                return await request()
+            except RETRYABLE_ERRORS as exc:
+                delay = random.uniform(
+                    RETRY_MIN_DELAY_SECONDS,
+                    min(RETRY_MAX_DELAY_SECONDS, RETRY_MIN_DELAY_SECONDS * 2**attempt),
+                )
+                logger.warning(
+                    "OpenAI request failed (%s), retry %d/%d in %.1f s",
+                    exc.__class__.__name__,
+                    attempt,
+                    RETRY_ATTEMPTS - 1,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+        return await request()
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-import html
+import functools
+import io
 import logging
+import os
 import re
 import tempfile
-from collections import deque
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from telegram import Bot, Message, Update
+from telegram import Bot, File, Message, Update
+from telegram.error import RetryAfter, TelegramError
 from telegram.ext import (
     Application,
     ChatMemberHandler,
@@ -23,21 +28,30 @@ from telegram.ext import (
 from .archive_parser import (
     ArchiveExtractionError,
     SUPPORTED_ARCHIVE_EXTENSIONS,
-    extract_archive_document_texts,
+    extract_archive_document_texts_async,
 )
 from .config import Settings
 from .docx_parser import (
     SUPPORTED_EXTENSIONS,
     DocumentExtractionError,
-    extract_document_text,
+    ExtractionProcessPool,
+    extract_document_bytes_async,
+    extract_document_text_async,
 )
-from .summarizer import TenderSummarizer
+from .summarizer import FALLBACK_SUMMARIES, ProgressCallback, TenderSummarizer
 
 logger = logging.getLogger(__name__)
 
 MEDIA_GROUP_WAIT_SECONDS = 2.0
+MEDIA_GROUP_POLL_SECONDS = 0.1
+PENDING_MEDIA_GROUPS_LIMIT = 512
+PENDING_MEDIA_GROUP_MAX_AGE_SECONDS = 60.0
 CONTEXT_MESSAGE_MAX_AGE_SECONDS = 30 * 60
 CONTEXT_BUFFER_SIZE = 30
+EXTRACT_CACHE_SIZE = 512
+EXTRACT_CACHE_TTL_SECONDS = 60 * 60
+IN_MEMORY_DOWNLOAD_MAX_BYTES = 4 * 1024 * 1024
+SUMMARY_CACHE_SIZE = 128
 UNAUTHORIZED_CHAT_TEXT = (
     "Работа бота в этом чате не разрешена. "
     "Бот покидает чат."
@@ -64,31 +78,58 @@ SUMMARY_HEADING_PREFIXES = (
     "риски и что уточнить",
     "не обработаны файлы",
 )
+SUMMARY_HEADING_PATTERN = re.compile(
+    r"\s*(?:" + "|".join(re.escape(prefix) for prefix in SUMMARY_HEADING_PREFIXES) + ")",
+    re.IGNORECASE,
+)
+MIME_TYPE_EXTENSIONS = {
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "application/pdf": ".pdf",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "application/vnd.ms-excel": ".xls",
+    "application/msexcel": ".xls",
+    "application/excel": ".xls",
+    "application/vnd.rar": ".rar",
+    "application/x-rar-compressed": ".rar",
+    "application/zip": ".zip",
+    "application/x-zip-compressed": ".zip",
+    "application/x-zip": ".zip",
+    "application/vnd.oasis.opendocument.text": ".odt",
+    "application/vnd.oasis.opendocument.spreadsheet": ".ods",
+}
+GROUP_TEXT_FILTER = filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS
+GROUP_DOCUMENT_FILTER = filters.Document.ALL & filters.ChatType.GROUPS
+HTML_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
 PROCUREMENT_LINK_PATTERN = re.compile(
     r"https?://(?:www\.)?zakupki\.gov\.ru/epz/order/\S+",
     re.IGNORECASE,
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentPayload:
     file_id: str
     file_unique_id: str
     file_name: str
     extension: str
+    file_size: int | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingMediaGroup:
-    status_message: Message
     chat_id: int
     source_user_id: int | None
     first_message_id: int
+    status_message: Message | None = None
     documents: list[DocumentPayload] = field(default_factory=list)
+    seen_ids: set[str] = field(default_factory=set)
+    created_at: float = 0.0
+    deadline: float = 0.0
     task: asyncio.Task[None] | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class RecentChatText:
     message_id: int
     text: str
@@ -99,29 +140,33 @@ class RecentChatText:
 class TenderTelegramBot:
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
-        self.summarizer = TenderSummarizer(
+        self.summarizer = TenderSummarizer.get_or_create(
             api_key=settings.openai_api_key,
             model=settings.openai_model,
             language=settings.summary_language,
             max_doc_chars=settings.max_doc_chars,
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
+            max_parallel_chunks=settings.max_parallel_chunks,
+            chunk_batch_size=settings.chunk_batch_size,
+            requests_per_minute=settings.openai_rpm,
+            tokens_per_minute=settings.openai_tpm,
+        )
+        self.app = (
+            Application.builder()
+            .token(settings.telegram_bot_token)
+            .post_shutdown(self.post_shutdown)
+            .build()
         )
-        self.app = Application.builder().token(settings.telegram_bot_token).build()
         self.app.add_handler(
             ChatMemberHandler(self.handle_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER)
         )
         self.app.add_handler(CommandHandler("start", self.start))
         self.app.add_handler(CommandHandler("help", self.help))
         self.app.add_handler(
-            MessageHandler(
-                filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS,
-                self.handle_group_text_message,
-            )
-        )
-        self.app.add_handler(
-            MessageHandler(filters.Document.ALL & filters.ChatType.GROUPS, self.handle_group_document)
+            MessageHandler(GROUP_TEXT_FILTER, self.handle_group_text_message)
         )
+        self.app.add_handler(MessageHandler(GROUP_DOCUMENT_FILTER, self.handle_group_document))
 
         self.pending_media_groups: dict[str, PendingMediaGroup] = {}
         self.pending_media_groups_lock = asyncio.Lock()
@@ -129,6 +174,29 @@ class TenderTelegramBot:
         self.recent_chat_texts_lock = asyncio.Lock()
         self.denied_chat_ids: set[int] = set()
         self.denied_chat_ids_lock = asyncio.Lock()
+        self.download_semaphore = asyncio.BoundedSemaphore(settings.max_parallel_downloads)
+        # Summaries are capped separately so slow LLM calls never hold
+        # download slots and downloads never wait for a summary to finish.
+        self.summarize_semaphore = asyncio.BoundedSemaphore(settings.openai_parallelism)
+        self.extract_pool = ExtractionProcessPool(max_workers=settings.extract_workers)
+        self.extract_threads = ThreadPoolExecutor(
+            max_workers=settings.extract_workers,
+            thread_name_prefix="extract",
+        )
+        # An archive holds its thread while unpacking and waiting for its
+        # documents, so archives get their own threads, one per download slot,
+        # and never starve .doc/.odt/.ods extraction.
+        self.archive_threads = ThreadPoolExecutor(
+            max_workers=settings.max_parallel_downloads,
+            thread_name_prefix="archive",
+        )
+        # Keyed by file_unique_id, so only names inside archives are stored:
+        # the display name comes from whoever sent the file this time.
+        self.extract_cache: OrderedDict[
+            str, tuple[float, list[tuple[str | None, str]]]
+        ] = OrderedDict()
+        self.extract_tasks: dict[str, asyncio.Task[list[tuple[str | None, str]]]] = {}
+        self.summary_cache: OrderedDict[tuple[object, ...], str] = OrderedDict()
 
     async def handle_my_chat_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         chat_member_update = update.my_chat_member
@@ -138,12 +206,12 @@ class TenderTelegramBot:
         chat = chat_member_update.chat
         old_status = chat_member_update.old_chat_member.status
         new_status = chat_member_update.new_chat_member.status
-        print(
-            "[bot-membership]"
-            f" chat_id={chat.id}"
-            f" title={chat.title!r}"
-            f" old_status={old_status}"
-            f" new_status={new_status}"
+        logger.info(
+            "[bot-membership] chat_id=%s title=%r old_status=%s new_status=%s",
+            chat.id,
+            chat.title,
+            old_status,
+            new_status,
         )
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -208,6 +276,7 @@ class TenderTelegramBot:
             file_unique_id=document.file_unique_id,
             file_name=file_name,
             extension=extension,
+            file_size=document.file_size,
         )
 
         media_group_id = message.media_group_id
@@ -247,21 +316,32 @@ class TenderTelegramBot:
                 await status_message.edit_text(MISSING_CONTEXT_TEXT)
                 return
 
-            await status_message.edit_text("Контекст найден, извлекаю текст...")
-            extracted_parts = await self.extract_payload_texts(payload=payload, bot=bot)
-            await status_message.edit_text("Текст извлечен, готовлю саммари...")
-            fallback_name = payload.file_name
-            if len(extracted_parts) > 1:
-                fallback_name = f"{payload.file_name} ({len(extracted_parts)} файла)"
-            summary = await self.summarize_extracted_parts(
-                extracted_parts=extracted_parts,
-                fallback_name=fallback_name,
-                context_text=context_text,
-            )
+            cache_key = self.summary_cache_key("document", [payload], context_text)
+            summary = self.get_cached_summary(cache_key)
+            if summary is None:
+                await status_message.edit_text("Контекст найден, извлекаю текст...")
+                extracted_parts = await self.extract_payload_texts(payload=payload, bot=bot)
+                await status_message.edit_text("Текст извлечен, готовлю саммари...")
+                fallback_name = payload.file_name
+                if len(extracted_parts) > 1:
+                    fallback_name = f"{payload.file_name} ({len(extracted_parts)} файла)"
+                summary = await self.summarize_extracted_parts(
+                    extracted_parts=extracted_parts,
+                    fallback_name=fallback_name,
+                    context_text=context_text,
+                    on_progress=self.summary_progress(status_message),
+                )
+                self.store_summary(cache_key, summary)
             formatted_summary = format_summary_for_telegram(summary)
 
-            await status_message.delete()
-            for part in split_for_telegram(formatted_summary):
+            # Telegram does not keep the order of concurrent sends, so only
+            # the status cleanup overlaps with the first part.
+            parts = split_for_telegram(formatted_summary)
+            await asyncio.gather(
+                status_message.delete(),
+                message.reply_text(parts[0], parse_mode="HTML"),
+            )
+            for part in parts[1:]:
                 await message.reply_text(part, parse_mode="HTML")
         except (DocumentExtractionError, ArchiveExtractionError):
             logger.exception("Document extraction failed")
@@ -286,17 +366,19 @@ class TenderTelegramBot:
         source_message_id: int,
         bot: Bot,
     ) -> None:
+        now = asyncio.get_running_loop().time()
         async with self.pending_media_groups_lock:
+            if len(self.pending_media_groups) > PENDING_MEDIA_GROUPS_LIMIT:
+                self.evict_stale_media_groups(now)
+
             pending = self.pending_media_groups.get(media_group_id)
+            is_new_group = pending is None
             if pending is None:
-                status_message = await message.reply_text(
-                    "Получил пакет документов, собираю все файлы..."
-                )
                 pending = PendingMediaGroup(
-                    status_message=status_message,
                     chat_id=message.chat_id,
                     source_user_id=sender_user_id,
                     first_message_id=source_message_id,
+                    created_at=now,
                 )
                 self.pending_media_groups[media_group_id] = pending
             else:
@@ -304,30 +386,76 @@ class TenderTelegramBot:
                 if pending.source_user_id is None:
                     pending.source_user_id = sender_user_id
 
-            if any(item.file_unique_id == payload.file_unique_id for item in pending.documents):
+            if payload.file_unique_id in pending.seen_ids:
                 return
+            pending.seen_ids.add(payload.file_unique_id)
             pending.documents.append(payload)
+            pending.deadline = now + MEDIA_GROUP_WAIT_SECONDS
+
+            if pending.task is None:
+                pending.task = asyncio.create_task(
+                    self.finalize_media_group(
+                        media_group_id=media_group_id,
+                        pending=pending,
+                        bot=bot,
+                    )
+                )
 
-            if pending.task and not pending.task.done():
-                pending.task.cancel()
-
-            pending.task = asyncio.create_task(
-                self.finalize_media_group(media_group_id=media_group_id, bot=bot)
-            )
-
-    async def finalize_media_group(self, media_group_id: str, bot: Bot) -> None:
-        try:
-            await asyncio.sleep(MEDIA_GROUP_WAIT_SECONDS)
-        except asyncio.CancelledError:
+        if not is_new_group:
             return
 
-        async with self.pending_media_groups_lock:
-            pending = self.pending_media_groups.pop(media_group_id, None)
+        # Sent outside the lock so other documents of the group are not blocked.
+        try:
+            pending.status_message = await message.reply_text(
+                "Получил пакет документов, собираю все файлы..."
+            )
+        except Exception:
+            async with self.pending_media_groups_lock:
+                if self.pending_media_groups.get(media_group_id) is pending:
+                    del self.pending_media_groups[media_group_id]
+            raise
+
+    def evict_stale_media_groups(self, now: float) -> None:
+        # Groups normally finish within seconds; anything older was left
+        # behind by a failure. Their finalize tasks exit once unregistered.
+        stale_ids = [
+            media_group_id
+            for media_group_id, pending in self.pending_media_groups.items()
+            if now - pending.created_at > PENDING_MEDIA_GROUP_MAX_AGE_SECONDS
+        ]
+        for media_group_id in stale_ids:
+            del self.pending_media_groups[media_group_id]
+        if stale_ids:
+            logger.warning("Evicted %d stale media groups", len(stale_ids))
+
+    async def finalize_media_group(
+        self,
+        media_group_id: str,
+        pending: PendingMediaGroup,
+        bot: Bot,
+    ) -> None:
+        # Every new document moves the deadline forward; the group is
+        # finalized once it passes and the status reply has been sent.
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.pending_media_groups.get(media_group_id) is not pending:
+                return
 
-        if pending is None:
-            return
+            delay = pending.deadline - loop.time()
+            if pending.status_message is None:
+                delay = max(delay, MEDIA_GROUP_POLL_SECONDS)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            async with self.pending_media_groups_lock:
+                if self.pending_media_groups.get(media_group_id) is not pending:
+                    return
+                status_message = pending.status_message
+                if status_message is not None and pending.deadline <= loop.time():
+                    del self.pending_media_groups[media_group_id]
+                    break
 
-        status_message = pending.status_message
         try:
             await status_message.edit_text("Пакет получен, проверяю контекст...")
             context_text = await self.find_recent_text_message(
@@ -344,11 +472,16 @@ class TenderTelegramBot:
                 documents=pending.documents,
                 context_text=context_text,
                 bot=bot,
+                on_progress=self.summary_progress(status_message),
             )
             formatted_summary = format_summary_for_telegram(summary)
 
-            await status_message.delete()
-            for part in split_for_telegram(formatted_summary):
+            parts = split_for_telegram(formatted_summary)
+            await asyncio.gather(
+                status_message.delete(),
+                bot.send_message(chat_id=pending.chat_id, text=parts[0], parse_mode="HTML"),
+            )
+            for part in parts[1:]:
                 await bot.send_message(chat_id=pending.chat_id, text=part, parse_mode="HTML")
         except (DocumentExtractionError, ArchiveExtractionError):
             logger.exception("Media group extraction failed")
@@ -366,16 +499,31 @@ class TenderTelegramBot:
         documents: list[DocumentPayload],
         context_text: str | None,
         bot: Bot,
+        on_progress: ProgressCallback | None = None,
     ) -> str:
         extracted_parts: list[tuple[str, str]] = []
         failed_files: list[str] = []
-
+        unique_documents: dict[str, DocumentPayload] = {}
         for payload in documents:
-            try:
-                parts = await self.extract_payload_texts(payload=payload, bot=bot)
-                extracted_parts.extend(parts)
-            except Exception as exc:
-                failed_files.append(f"{payload.file_name}: {exc}")
+            unique_documents.setdefault(payload.file_unique_id, payload)
+        documents = list(unique_documents.values())
+
+        cache_key = self.summary_cache_key("media_group", documents, context_text)
+        cached_summary = self.get_cached_summary(cache_key)
+        if cached_summary is not None:
+            return cached_summary
+
+        results = await asyncio.gather(
+            *(self.extract_payload_texts(payload=payload, bot=bot) for payload in documents),
+            return_exceptions=True,
+        )
+        for payload, result in zip(documents, results):
+            if isinstance(result, Exception):
+                failed_files.append(f"{payload.file_name}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                extracted_parts.extend(result)
 
         if not extracted_parts:
             raise DocumentExtractionError("No files were extracted")
@@ -384,14 +532,50 @@ class TenderTelegramBot:
             extracted_parts=extracted_parts,
             fallback_name=f"Пакет документов ({len(extracted_parts)} файла)",
             context_text=context_text,
+            on_progress=on_progress,
         )
 
         if failed_files:
             failures_text = "\n".join(f"- {item}" for item in failed_files)
             summary = f"{summary}\n\nНе обработаны файлы:\n{failures_text}"
+        else:
+            # Partial results are not cached so a retry can pick up the
+            # files that failed this time.
+            self.store_summary(cache_key, summary)
 
         return summary
 
+    def summary_cache_key(
+        self,
+        kind: str,
+        documents: list[DocumentPayload],
+        context_text: str | None,
+    ) -> tuple[object, ...]:
+        # File names and the kind of request are part of the key because they
+        # decide the summary's title.
+        return (
+            kind,
+            tuple(sorted((payload.file_unique_id, payload.file_name) for payload in documents)),
+            self.summarizer.model,
+            self.summarizer.language,
+            context_text or "",
+        )
+
+    def get_cached_summary(self, key: tuple[object, ...]) -> str | None:
+        summary = self.summary_cache.get(key)
+        if summary is not None:
+            self.summary_cache.move_to_end(key)
+        return summary
+
+    def store_summary(self, key: tuple[object, ...], summary: str) -> None:
+        # A fallback answer is usually a transient failure; let the next
+        # request try again.
+        if summary.endswith(FALLBACK_SUMMARIES):
+            return
+        self.summary_cache[key] = summary
+        if len(self.summary_cache) > SUMMARY_CACHE_SIZE:
+            self.summary_cache.popitem(last=False)
+
     async def store_recent_text_message(
         self,
         chat_id: int,
@@ -433,19 +617,24 @@ class TenderTelegramBot:
             if not history:
                 return None
 
-            self.cleanup_text_history(history)
-            candidates = [item for item in history if item.message_id < before_message_id]
-            if not candidates:
-                return None
-
-            procurement_candidates = [item for item in candidates if item.has_procurement_link]
-            if procurement_candidates:
-                return max(procurement_candidates, key=lambda item: item.message_id).text
-
-            return max(candidates, key=lambda item: item.message_id).text
+            # History is appended in message order, so the newest match wins and
+            # everything left of the first expired entry is expired too.
+            cutoff = context_history_cutoff()
+            latest: RecentChatText | None = None
+            for item in reversed(history):
+                if item.date < cutoff:
+                    break
+                if item.message_id >= before_message_id:
+                    continue
+                if item.has_procurement_link:
+                    return item.text
+                if latest is None:
+                    latest = item
+
+            return latest.text if latest else None
 
     def cleanup_text_history(self, history: deque[RecentChatText]) -> None:
-        cutoff = datetime.now(timezone.utc) - timedelta(seconds=CONTEXT_MESSAGE_MAX_AGE_SECONDS)
+        cutoff = context_history_cutoff()
         while history and history[0].date < cutoff:
             history.popleft()
 
@@ -458,11 +647,11 @@ class TenderTelegramBot:
             return True
 
         message = update.effective_message
-        if message:
-            print(
-                "[group-message]"
-                f" chat_id={message.chat.id}"
-                f" message_id={message.message_id}"
+        if message and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[group-message] chat_id=%s message_id=%s",
+                message.chat.id,
+                message.message_id,
             )
 
         if not self.settings.whitelist_chat_ids:
@@ -495,14 +684,62 @@ class TenderTelegramBot:
         payload: DocumentPayload,
         bot: Bot,
     ) -> list[tuple[str, str]]:
-        if payload.extension in SUPPORTED_EXTENSIONS:
-            text = await self.download_and_extract_text(payload=payload, bot=bot)
-            if not text.strip():
-                raise DocumentExtractionError(f"{payload.file_name}: пустой текст")
-            return [(payload.file_name, text)]
+        # Forwarded copies of a file share file_unique_id, so they are
+        # extracted once per TTL.
+        cached = self.extract_cache.get(payload.file_unique_id)
+        if cached is not None:
+            expires_at, cached_parts = cached
+            if expires_at > time.monotonic():
+                self.extract_cache.move_to_end(payload.file_unique_id)
+                return payload_part_names(payload, cached_parts)
+            del self.extract_cache[payload.file_unique_id]
+
+        # Concurrent requests for the same file share one download. The task
+        # is shielded so a cancelled caller does not cancel it for the rest.
+        task = self.extract_tasks.get(payload.file_unique_id)
+        if task is None:
+            task = asyncio.create_task(
+                self.download_and_extract_payload_texts(payload=payload, bot=bot)
+            )
+            self.extract_tasks[payload.file_unique_id] = task
+            task.add_done_callback(
+                functools.partial(self.store_extracted_parts, payload.file_unique_id)
+            )
+        return payload_part_names(payload, await asyncio.shield(task))
+
+    def store_extracted_parts(
+        self,
+        file_unique_id: str,
+        task: asyncio.Task[list[tuple[str | None, str]]],
+    ) -> None:
+        self.extract_tasks.pop(file_unique_id, None)
+        if task.cancelled() or task.exception() is not None:
+            return
 
-        if payload.extension in SUPPORTED_ARCHIVE_EXTENSIONS:
-            return await self.download_and_extract_archive_texts(payload=payload, bot=bot)
+        # The summarizer never reads past max_doc_chars * 2 characters of a
+        # text, so there is no point keeping more of it for an hour.
+        max_chars = self.settings.max_doc_chars * 2
+        self.extract_cache[file_unique_id] = (
+            time.monotonic() + EXTRACT_CACHE_TTL_SECONDS,
+            [(inner_name, text[:max_chars]) for inner_name, text in task.result()],
+        )
+        if len(self.extract_cache) > EXTRACT_CACHE_SIZE:
+            self.extract_cache.popitem(last=False)
+
+    async def download_and_extract_payload_texts(
+        self,
+        payload: DocumentPayload,
+        bot: Bot,
+    ) -> list[tuple[str | None, str]]:
+        async with self.download_semaphore:
+            if payload.extension in SUPPORTED_EXTENSIONS:
+                text = await self.download_and_extract_text(payload=payload, bot=bot)
+                if not text.strip():
+                    raise DocumentExtractionError(f"{payload.file_name}: пустой текст")
+                return [(None, text)]
+
+            if payload.extension in SUPPORTED_ARCHIVE_EXTENSIONS:
+                return await self.download_and_extract_archive_texts(payload=payload, bot=bot)
 
         raise DocumentExtractionError(f"{payload.file_name}: unsupported extension {payload.extension}")
 
@@ -511,70 +748,102 @@ class TenderTelegramBot:
         extracted_parts: list[tuple[str, str]],
         fallback_name: str,
         context_text: str | None = None,
+        on_progress: ProgressCallback | None = None,
     ) -> str:
         if len(extracted_parts) == 1 and not context_text:
-            return await self.summarizer.summarize(
-                text=extracted_parts[0][1],
-                file_name=extracted_parts[0][0],
-            )
+            async with self.summarize_semaphore:
+                return await self.summarizer.summarize(
+                    text=extracted_parts[0][1],
+                    file_name=extracted_parts[0][0],
+                    on_progress=on_progress,
+                )
 
-        sections: list[str] = []
+        combined = io.StringIO()
         if context_text:
-            sections.append(
-                "### Контекст из сообщения перед пакетом\n"
-                f"{context_text}"
+            combined.write("### Контекст из сообщения перед пакетом\n")
+            combined.write(context_text)
+            combined.write("\n\n")
+
+        for idx, (name, text) in enumerate(extracted_parts, start=1):
+            if idx > 1:
+                combined.write("\n\n")
+            combined.write(f"### Документ {idx}: {name}\n")
+            combined.write(text)
+        combined_text = combined.getvalue()
+
+        async with self.summarize_semaphore:
+            return await self.summarizer.summarize(
+                text=combined_text,
+                file_name=fallback_name,
+                on_progress=on_progress,
             )
 
-        sections.extend(
-            f"### Документ {idx}: {name}\n{text}"
-            for idx, (name, text) in enumerate(extracted_parts, start=1)
-        )
-        combined_text = "\n\n".join(sections)
+    def summary_progress(self, status_message: Message) -> ProgressCallback:
+        flood_wait = False
 
-        return await self.summarizer.summarize(
-            text=combined_text,
-            file_name=fallback_name,
-        )
+        async def show_partial_summary(partial: str) -> None:
+            nonlocal flood_wait
+            if flood_wait:
+                return
+            preview = split_for_telegram(format_summary_for_telegram(partial))[0]
+            if not preview:
+                return
+            try:
+                await status_message.edit_text(preview, parse_mode="HTML")
+            except RetryAfter:
+                # More previews would only extend the flood wait and make the
+                # final summary fail to send.
+                flood_wait = True
+                logger.info("Partial summaries stopped: chat is rate limited")
+            except TelegramError:
+                logger.debug("Failed to show partial summary", exc_info=True)
+
+        return show_partial_summary
 
     async def download_and_extract_archive_texts(
         self,
         payload: DocumentPayload,
         bot: Bot,
     ) -> list[tuple[str, str]]:
-        temp_path: Path | None = None
+        telegram_file = await bot.get_file(payload.file_id)
+        temp_path = await download_to_temp_file(telegram_file, suffix=payload.extension or ".rar")
         try:
-            telegram_file = await bot.get_file(payload.file_id)
-            with tempfile.NamedTemporaryFile(
-                suffix=payload.extension or ".rar",
-                delete=False,
-            ) as temp_file:
-                temp_path = Path(temp_file.name)
-
-            await telegram_file.download_to_drive(custom_path=str(temp_path))
-            extracted = extract_archive_document_texts(temp_path)
-            return [
-                (f"{payload.file_name} / {inner_name}", text)
-                for inner_name, text in extracted
-            ]
+            return await extract_archive_document_texts_async(
+                temp_path,
+                executor=self.archive_threads,
+                document_executor=self.extract_pool,
+            )
         finally:
-            if temp_path and temp_path.exists():
-                temp_path.unlink(missing_ok=True)
+            temp_path.unlink(missing_ok=True)
 
     async def download_and_extract_text(self, payload: DocumentPayload, bot: Bot) -> str:
-        temp_path: Path | None = None
+        telegram_file = await bot.get_file(payload.file_id)
+        if payload.file_size is None or payload.file_size <= IN_MEMORY_DOWNLOAD_MAX_BYTES:
+            data = await telegram_file.download_as_bytearray()
+            return await extract_document_bytes_async(
+                data,
+                payload.extension,
+                executor=self.extract_pool,
+                thread_executor=self.extract_threads,
+            )
+
+        # Large files are parsed from disk so the worker process gets a path
+        # instead of a pickled copy of the whole file.
+        temp_path = await download_to_temp_file(telegram_file, suffix=payload.extension or ".bin")
         try:
-            telegram_file = await bot.get_file(payload.file_id)
-            with tempfile.NamedTemporaryFile(
-                suffix=payload.extension or ".bin",
-                delete=False,
-            ) as temp_file:
-                temp_path = Path(temp_file.name)
-
-            await telegram_file.download_to_drive(custom_path=str(temp_path))
-            return extract_document_text(temp_path)
+            return await extract_document_text_async(
+                temp_path,
+                executor=self.extract_pool,
+                thread_executor=self.extract_threads,
+            )
         finally:
-            if temp_path and temp_path.exists():
-                temp_path.unlink(missing_ok=True)
+            temp_path.unlink(missing_ok=True)
+
+    async def post_shutdown(self, application: Application) -> None:
+        await self.summarizer.close()
+        self.extract_pool.shutdown(wait=False, cancel_futures=True)
+        self.extract_threads.shutdown(wait=False, cancel_futures=True)
+        self.archive_threads.shutdown(wait=False, cancel_futures=True)
 
     def run(self) -> None:
         self.app.run_polling(close_loop=False)
@@ -586,104 +855,86 @@ def split_for_telegram(text: str, limit: int = 3900) -> list[str]:
         return [text]
 
     parts: list[str] = []
-    current = []
-    current_len = 0
-
-    for paragraph in text.split("\n"):
-        line = paragraph.strip()
-        candidate_len = current_len + len(line) + 1
+    start = 0
+    while len(text) - start > limit:
+        # Cut at the last line break that keeps the part within the limit,
+        # or hard-split a line that is longer than the limit.
+        end = text.rfind("\n", start, start + limit + 1)
+        if end <= start:
+            end = start + limit
+            next_start = end
+        else:
+            next_start = end + 1
 
-        if candidate_len > limit and current:
-            parts.append("\n".join(current).strip())
-            current = [line]
-            current_len = len(line)
-            continue
-
-        if len(line) > limit:
-            if current:
-                parts.append("\n".join(current).strip())
-                current = []
-                current_len = 0
-            for i in range(0, len(line), limit):
-                parts.append(line[i : i + limit])
-            continue
+        part = text[start:end].strip()
+        if part:
+            parts.append(part)
+        start = next_start
 
-        current.append(line)
-        current_len = candidate_len
+    tail = text[start:].strip()
+    if tail:
+        parts.append(tail)
 
-    if current:
-        parts.append("\n".join(current).strip())
-
-    return [part for part in parts if part]
+    return parts
 
 
 def format_summary_for_telegram(text: str) -> str:
-    lines = text.splitlines()
-    formatted: list[str] = []
+    output = io.StringIO()
 
-    for raw_line in lines:
+    for index, raw_line in enumerate(text.splitlines()):
+        if index:
+            output.write("\n")
         stripped = raw_line.strip()
         if not stripped:
-            formatted.append("")
             continue
 
         cleaned = stripped.lstrip("-• ").strip()
         if is_summary_heading(cleaned):
             heading, separator, tail = cleaned.partition(":")
-            heading_html = f"<b>{html.escape((heading + separator).strip())}</b>"
-            if tail.strip():
-                formatted.append(f"{heading_html} {html.escape(tail.strip())}")
-            else:
-                formatted.append(heading_html)
+            output.write(f"<b>{(heading + separator).strip().translate(HTML_ESCAPE_TABLE)}</b>")
+            tail = tail.strip()
+            if tail:
+                output.write(f" {tail.translate(HTML_ESCAPE_TABLE)}")
             continue
 
-        formatted.append(html.escape(stripped))
+        output.write(stripped.translate(HTML_ESCAPE_TABLE))
 
-    return "\n".join(formatted).strip()
+    return output.getvalue().strip()
 
 
 def is_summary_heading(line: str) -> bool:
-    normalized = line.lower().strip()
-    return any(normalized.startswith(prefix) for prefix in SUMMARY_HEADING_PREFIXES)
+    return SUMMARY_HEADING_PATTERN.match(line) is not None
 
 
+@functools.lru_cache(maxsize=256)
 def detect_document_extension(file_name: str, mime_type: str | None) -> str:
     extension = Path(file_name).suffix.lower()
     if extension:
         return extension
 
-    normalized_mime = (mime_type or "").lower()
-    if normalized_mime == "application/msword":
-        return ".doc"
-    if (
-        normalized_mime
-        == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    ):
-        return ".docx"
-    if normalized_mime == "application/pdf":
-        return ".pdf"
-    if normalized_mime == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
-        return ".xlsx"
-    if normalized_mime in {
-        "application/vnd.ms-excel",
-        "application/msexcel",
-        "application/excel",
-    }:
-        return ".xls"
-    if normalized_mime in {"application/vnd.rar", "application/x-rar-compressed"}:
-        return ".rar"
-    if normalized_mime in {
-        "application/zip",
-        "application/x-zip-compressed",
-        "application/x-zip",
-    }:
-        return ".zip"
-    if normalized_mime == "application/vnd.oasis.opendocument.text":
-        return ".odt"
-    if normalized_mime == "application/vnd.oasis.opendocument.spreadsheet":
-        return ".ods"
-
-    return ""
+    return MIME_TYPE_EXTENSIONS.get((mime_type or "").lower(), "")
+
+
+async def download_to_temp_file(telegram_file: File, suffix: str) -> Path:
+    fd, name = tempfile.mkstemp(suffix=suffix)
+    temp_path = Path(name)
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            await telegram_file.download_to_memory(out=temp_file)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path
+
+
+def payload_part_names(
+    payload: DocumentPayload,
+    parts: list[tuple[str | None, str]],
+) -> list[tuple[str, str]]:
+    return [
+        (payload.file_name if inner_name is None else f"{payload.file_name} / {inner_name}", text)
+        for inner_name, text in parts
+    ]
 
 
 def is_supported_upload_extension(extension: str) -> bool:
@@ -694,6 +945,10 @@ def contains_procurement_link(text: str) -> bool:
     return bool(PROCUREMENT_LINK_PATTERN.search(text))
 
 
+def context_history_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=CONTEXT_MESSAGE_MAX_AGE_SECONDS)
+
+
 def normalize_datetime(value: datetime) -> datetime:
     if value.tzinfo is None:
         return value.replace(tzinfo=timezone.utc)
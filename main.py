@@ -1,13 +1,29 @@
 import asyncio
 import logging
+import os
 import sys
 
 
 def configure_logging():
+    level_name = os.getenv("LOG_LEVEL", "INFO").strip().upper() or "INFO"
+    # getLevelName() maps known names to their number and anything else to a
+    # "Level ..." string (getLevelNamesMapping() needs Python 3.11).
+    level = logging.getLevelName(level_name)
     logging.basicConfig(
-        level=logging.INFO,
+        level=level if isinstance(level, int) else logging.INFO,
         format="%(asctime)s %(levelname)s %(name)s: %(message)s",
     )
+    if not isinstance(level, int):
+        logging.warning("Unknown LOG_LEVEL %r, using INFO", level_name)
+
+
+def install_event_loop_policy():
+    # uvloop is optional; without it the default asyncio loop is used.
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
 def ensure_python_version():
@@ -25,8 +41,10 @@ def main():
 
     from app.config import load_settings
 
-    configure_logging()
+    # load_settings() also loads .env, which may set LOG_LEVEL.
     settings = load_settings()
+    configure_logging()
+    install_event_loop_policy()
 
     if settings.bot_platform == "max":
         from app.max_bot import TenderMaxBot